@@ -1,41 +1,64 @@
 import argparse
 import logging
 import os
+import shutil
 import cv2
 import threading
 import asyncio
+import queue
 import json
 import math
 import numpy as np
+import torch
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from ultralytics import YOLO
-import mediapipe as mp
+from seat_geometry import box_intersections, cluster_chair_detections, expand_box
+
+@asynccontextmanager
+async def lifespan(app):
+    """Load the model (if __main__ hasn't already), read the dashboard page and start the video pipeline with the server."""
+    global model, index_html
+    if model is None:
+        model = load_model(MODEL_PATH)
+    with open("index.html", "r") as f:
+        index_html = f.read()
+    start_pipeline()
+    yield
 
 # Initialize FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Global state
-seat_status = {}
-lock = threading.Lock()
 calibration_data = []
 fixed_chair_boxes = []
+# chair boxes as an (N,4) int32 array plus the 30%-of-area overlap needed to mark each one occupied,
+# built once after calibration
+chair_box_arr = np.zeros((0, 4), dtype=np.int32)
+chair_min_overlap = np.zeros(0)
+# chair boxes grown by SEAT_EXPAND_SCALE, (N,4) int32, for the hip-point test
+chair_expanded_arr = np.zeros((0, 4), dtype=np.int32)
+# index of each calibrated chair's seat in ALL_SEAT_IDS (two chairs may snap to the same seat),
+# and the distinct seats that have at least one chair
+chair_seat_idx = np.zeros(0, dtype=np.intp)
+calibrated_seat_idx = np.zeros(0, dtype=np.intp)
 is_calibrated = False
-# occupancy smoothing counters (number of consecutive frames seen occupied)
-occupancy_counters = {}
 OCCUPANCY_THRESHOLD_FRAMES = 3
-
-# Load Models
-os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5)
+# Pipeline stages (capture -> inference -> render) hand frames over through small bounded
+# queues so camera I/O and the debug window overlap with model execution. frame_queue is
+# sized to two inference batches once BATCH_SIZE is known (start_pipeline)
+frame_queue = queue.Queue(maxsize=2)
+render_queue = queue.Queue(maxsize=2)
+stop_event = threading.Event()
 
 # this will be initialized once we know the model path
 model = None
+index_html = ""  # dashboard page, read once at startup
 
 # Video source and configuration defaults (overridden by CLI args)
 VIDEO_PATH = "vedio3.mp4"
@@ -43,7 +66,41 @@ MODEL_PATH = "yolov8m.pt"
 CONF_THRESHOLD = 0.4
 IOU_THRESHOLD = 0.5
 CALIBRATION_FRAMES = 45
+TARGET_FPS = 15
 PORT = 8000
+# the annotated "Debug View" window is only drawn and shown when the DEBUG env var is set
+DEBUG = bool(os.getenv("DEBUG"))
+USE_TENSORRT = True
+# INT8 engines are calibrated on INT8_CALIB_FRAMES frames sampled from the video into CALIB_DIR
+USE_INT8 = False
+INT8_CALIB_FRAMES = 200
+CALIB_DIR = "calib"
+# Frames are processed and drawn at FRAME_SIZE, but YOLO sees an aspect-preserving
+# INFER_SIZE copy letterboxed to INFER_IMGSZ (height, width; multiples of the model stride).
+# TensorRT engines are built with INFER_IMGSZ as their optimisation shape plus a dynamic batch
+# dimension (see load_model); boxes are scaled back by BOX_SCALE.
+FRAME_SIZE = (960, 540)
+INFER_SIZE = (640, 360)
+INFER_IMGSZ = (384, 640)
+BOX_SCALE = FRAME_SIZE[0] / INFER_SIZE[0]
+WARMUP_RUNS = 3
+# frames submitted to the model per call; TensorRT engines are exported with a dynamic
+# batch dimension up to MAX_ENGINE_BATCH
+BATCH_SIZE = 4
+MAX_ENGINE_BATCH = 8
+# frames whose 32x18 grayscale thumbnail differs from the last analysed frame by less than
+# MOTION_THRESHOLD (mean absolute difference) reuse the previous detections; a refresh is
+# forced every DETECTION_REFRESH_FRAMES frames regardless
+MOTION_THRESHOLD = 2.0
+DETECTION_REFRESH_FRAMES = 15
+# chair boxes are grown by this factor before testing whether a person's hip point lies on them
+SEAT_EXPAND_SCALE = 1.25
+# calibration clusters chair detections within CHAIR_CLUSTER_EPS pixels; merged clusters are
+# split with a halved radius (see seat_geometry.cluster_chair_detections)
+CHAIR_CLUSTER_EPS = 50
+# COCO class ids; inference is restricted to these so NMS only sees people and chairs
+PERSON_CLASS = 0
+CHAIR_CLASS = 56
 
 # 6x5 Grid Layout (Rows x Columns)
 # Derived from SVG analysis
@@ -55,248 +112,354 @@ GRID_LAYOUT = [
     ["seat-25", "seat-30", "seat-29", "seat-26", "seat-28", "seat-27"]  # Row 4
 ]
 ALL_SEAT_IDS = [seat for row in GRID_LAYOUT for seat in row]
+# occupancy smoothing counters (number of consecutive frames seen occupied), indexed like ALL_SEAT_IDS
+occupancy_counters = np.zeros(len(ALL_SEAT_IDS), dtype=np.int32)
+# published seat state, 1 = occupied, indexed like ALL_SEAT_IDS. The inference thread is the
+# only writer and overwrites it with one slice assignment per frame, so readers go lock-free.
+seat_state = np.zeros(len(ALL_SEAT_IDS), dtype=np.uint8)
 
-def process_video():
-    """Background thread that reads frames, performs detection, calibration and updates
-    the shared seat_status dictionary."""
-    global seat_status, is_calibrated, fixed_chair_boxes, occupancy_counters
+def export_calibration_set(video_path, out_dir, num_frames, names):
+    """Sample num_frames frames evenly across the video into out_dir/images, resized the way
+    inference sees them, and write the dataset yaml TensorRT INT8 calibration reads."""
+    image_dir = os.path.join(out_dir, "images")
+    os.makedirs(image_dir, exist_ok=True)
+    cap = cv2.VideoCapture(video_path)
+    step = max(1, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) // num_frames)
+    saved = 0
+    while saved < num_frames:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, saved * step)
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frame = cv2.resize(cv2.resize(frame, FRAME_SIZE), INFER_SIZE, interpolation=cv2.INTER_AREA)
+        cv2.imwrite(os.path.join(image_dir, f"{saved:04d}.jpg"), frame)
+        saved += 1
+    cap.release()
+    logging.info("Saved %d calibration frames to %s", saved, image_dir)
+
+    yaml_path = os.path.join(out_dir, "calib.yaml")
+    with open(yaml_path, "w") as f:
+        f.write(f"path: {os.path.abspath(out_dir)}\ntrain: images\nval: images\nnames:\n")
+        for cls_id, name in names.items():
+            f.write(f"  {cls_id}: {name}\n")
+    return yaml_path
+
+def load_model(model_path):
+    """Load the YOLO detector, preferring a TensorRT engine when a CUDA GPU is present.
+
+    The engine is exported once next to the .pt weights and reused on later runs.
+    FP16 is only requested on GPUs with native half-precision Tensor Cores; with USE_INT8
+    the engine is instead quantized to INT8, calibrated on frames from VIDEO_PATH."""
+    if USE_TENSORRT and BATCH_SIZE > MAX_ENGINE_BATCH:
+        logging.warning("Batch size %d exceeds the TensorRT engine limit of %d; using %s",
+                        BATCH_SIZE, MAX_ENGINE_BATCH, model_path)
+    elif USE_TENSORRT and model_path.endswith(".pt") and torch.cuda.is_available():
+        # ultralytics writes <stem>.engine (and <stem>.onnx) next to the weights it exports, so
+        # INT8 is exported from a <stem>-int8.pt copy to keep it from overwriting the FP16 engine
+        source_path = os.path.splitext(model_path)[0] + ("-int8.pt" if USE_INT8 else ".pt")
+        engine_path = os.path.splitext(source_path)[0] + ".engine"
+        if not os.path.exists(engine_path):
+            if source_path != model_path:
+                shutil.copyfile(model_path, source_path)
+            source = YOLO(source_path)
+            if USE_INT8:
+                calib_yaml = export_calibration_set(VIDEO_PATH, CALIB_DIR, INT8_CALIB_FRAMES, source.names)
+                logging.info("Exporting %s to INT8 TensorRT engine", model_path)
+                source.export(format="engine", int8=True, data=calib_yaml, imgsz=INFER_IMGSZ,
+                              dynamic=True, batch=MAX_ENGINE_BATCH, device=0)
+            else:
+                half = torch.cuda.get_device_capability(0) >= (7, 0)
+                logging.info("Exporting %s to TensorRT engine (half=%s)", model_path, half)
+                source.export(format="engine", half=half, imgsz=INFER_IMGSZ, dynamic=True,
+                              batch=MAX_ENGINE_BATCH, device=0)
+        model_path = engine_path
+    logging.info("Loading model %s", model_path)
+    yolo = YOLO(model_path, task="detect")
+    # warm-up runs so engine deserialization isn't charged to the first real frame
+    dummy = [np.zeros((INFER_SIZE[1], INFER_SIZE[0], 3), dtype=np.uint8)] * BATCH_SIZE
+    for _ in range(WARMUP_RUNS):
+        yolo(dummy, verbose=False, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD, imgsz=INFER_IMGSZ,
+             classes=[PERSON_CLASS, CHAIR_CLASS])
+    return yolo
+
+def put_latest(q, item):
+    """Put item on a bounded queue, discarding the oldest entry when it is full."""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+def put_blocking(q, item):
+    """Put item on a bounded queue, waiting for space until stop_event is set."""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+def get_blocking(q):
+    """Get an item from a queue, returning None once stop_event is set."""
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return None
+
+def capture_frames():
+    """Capture stage: read and resize frames. Video files are read at the pace inference
+    consumes them, so calibration and detection see consecutive frames; live sources keep
+    only the newest frames queued so inference always works on recent footage."""
     cap = cv2.VideoCapture(VIDEO_PATH)
     if not cap.isOpened():
         logging.error("Cannot open video source %s", VIDEO_PATH)
+        stop_event.set()
         return
-    frame_count = 0
-    logging.info("Starting video processing from %s", VIDEO_PATH)
-    
-    while True:
-        ret, frame = cap.read()
+    put_frame = put_blocking if os.path.isfile(VIDEO_PATH) else put_latest
+    # live cameras: keep the driver queue to one frame so reads aren't served stale footage
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    # analyse roughly TARGET_FPS frames per second whatever the source rate
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or TARGET_FPS
+    frame_skip = max(0, round(source_fps / TARGET_FPS) - 1)
+    logging.info("Starting video capture from %s (%.1f FPS, skipping %d of every %d frames)",
+                 VIDEO_PATH, source_fps, frame_skip, frame_skip + 1)
+    while not stop_event.is_set():
+        # grab() advances past the skipped frames without decoding them
+        ret = all(cap.grab() for _ in range(frame_skip))
+        if ret:
+            ret, frame = cap.read()
         if not ret:
             cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
             continue
-        
-        frame = cv2.resize(frame, (960, 540))
-        
+        put_frame(frame_queue, cv2.resize(frame, FRAME_SIZE))
+    cap.release()
+
+def render_frames():
+    """Render stage: show annotated frames in the debug window; 'q' stops the pipeline."""
+    while not stop_event.is_set():
+        frame = get_blocking(render_queue)
+        if frame is None:
+            break
+        cv2.imshow("Debug View", frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            stop_event.set()
+    cv2.destroyAllWindows()
+
+def process_video():
+    """Inference stage: performs detection, calibration and updates the shared
+    seat_state array for frames handed over by capture_frames."""
+    global is_calibrated, fixed_chair_boxes, occupancy_counters, chair_box_arr, chair_min_overlap, chair_expanded_arr, chair_seat_idx, calibrated_seat_idx
+    frame_count = 0
+    frame_idx = 0
+    last_small = None
+    last_detections = ([], [])
+
+    while not stop_event.is_set():
+        # Collect a small batch of frames so the model runs them in a single call
+        frames = [get_blocking(frame_queue) for _ in range(BATCH_SIZE)]
+        if stop_event.is_set():
+            break
+
+        # Motion gate: only frames that differ from the last analysed one (or are due for a
+        # periodic refresh, so new entrants aren't missed) go through YOLO
+        infer_frames = [cv2.resize(frame, INFER_SIZE, interpolation=cv2.INTER_AREA) for frame in frames]
+        infer_set = set()
+        for i, infer_frame in enumerate(infer_frames):
+            frame_idx += 1
+            gray = cv2.cvtColor(infer_frame, cv2.COLOR_BGR2GRAY)
+            small = cv2.resize(gray, (32, 18), interpolation=cv2.INTER_AREA)
+            if (last_small is None or frame_idx % DETECTION_REFRESH_FRAMES == 0
+                    or cv2.absdiff(small, last_small).mean() >= MOTION_THRESHOLD):
+                infer_set.add(i)
+                last_small = small
+
         # YOLO Detection
-        results = model(frame, verbose=False, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD)[0]
-        chairs = []
-        persons = []
-        
-        for box in results.boxes:
-            cls_id = int(box.cls[0])
-            label = model.names[cls_id]
-            conf = float(box.conf[0])
-            if conf < CONF_THRESHOLD:
-                continue
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            if label == "chair":
-                chairs.append((x1, y1, x2, y2))
-            elif label == "person":
-                persons.append((x1, y1, x2, y2))
-        
-        # Calibration Phase
-        if not is_calibrated:
-            frame_count += 1
-            print(f"Calibrating... Frame {frame_count}/{CALIBRATION_FRAMES}")
-            calibration_data.extend(chairs)
-            
-            if frame_count >= CALIBRATION_FRAMES:
-                print("Calibration complete. Computing grid mapping...")
-                
-                # 1. Cluster detections to find unique chairs
-                clusters = []
-                THRESHOLD = 50 
-                
-                for box in calibration_data:
-                    cx = (box[0] + box[2]) / 2
-                    cy = (box[1] + box[3]) / 2
-                    matched = False
+        # stream=True yields Results one at a time instead of building a list; iterating the
+        # generator to the end releases the predictor for the next batch
+        detections = {}
+        infer_order = sorted(infer_set)
+        stream = model([infer_frames[i] for i in infer_order], stream=True, verbose=False,
+                       conf=CONF_THRESHOLD, iou=IOU_THRESHOLD, imgsz=INFER_IMGSZ,
+                       classes=[PERSON_CLASS, CHAIR_CLASS]) if infer_order else []
+        for results, i in zip(stream, infer_order):
+            # one device sync per tensor instead of several per box
+            xyxy = (results.boxes.xyxy.cpu().numpy() * BOX_SCALE).astype(np.int32)
+            cls_ids = results.boxes.cls.cpu().numpy().astype(np.int32)
+            keep = results.boxes.conf.cpu().numpy() >= CONF_THRESHOLD
+            detections[i] = (xyxy[keep & (cls_ids == CHAIR_CLASS)].tolist(),
+                             xyxy[keep & (cls_ids == PERSON_CLASS)].tolist())
+
+        # frames are handled in capture order; skipped frames reuse the latest detections
+        for i, frame in enumerate(frames):
+            last_detections = detections.get(i, last_detections)
+            chairs, persons = last_detections
+
+            # Calibration Phase
+            if not is_calibrated:
+                frame_count += 1
+                print(f"Calibrating... Frame {frame_count}/{CALIBRATION_FRAMES}")
+                calibration_data.extend(chairs)
+
+                if frame_count >= CALIBRATION_FRAMES:
+                    print("Calibration complete. Computing grid mapping...")
+
+                    # 1. Cluster detections to find unique chairs
+                    min_detections = CALIBRATION_FRAMES * 0.4
+                    clusters = cluster_chair_detections(calibration_data, eps=CHAIR_CLUSTER_EPS,
+                                                        min_samples=max(1, int(min_detections)),
+                                                        max_size=CALIBRATION_FRAMES)
+
+                    # 2. Compute stable centroids
+                    stable_chairs = []
                     for cluster in clusters:
-                        ccx = sum(c['cx'] for c in cluster['points']) / len(cluster['points'])
-                        ccy = sum(c['cy'] for c in cluster['points']) / len(cluster['points'])
-                        dist = ((cx - ccx)**2 + (cy - ccy)**2)**0.5
-                        if dist < THRESHOLD:
-                            cluster['points'].append({'cx': cx, 'cy': cy, 'box': box})
-                            matched = True
-                            break
-                    if not matched:
-                        clusters.append({'points': [{'cx': cx, 'cy': cy, 'box': box}]})
-                
-                # 2. Compute stable centroids
-                stable_chairs = []
-                for cluster in clusters:
-                    if len(cluster['points']) < (CALIBRATION_FRAMES * 0.4):
+                        if len(cluster) < min_detections:
+                            continue
+                        avg_x1, avg_y1, avg_x2, avg_y2 = cluster.mean(axis=0)
+
+                        cx = (avg_x1 + avg_x2) / 2
+                        cy = (avg_y1 + avg_y2) / 2
+
+                        stable_chairs.append({
+                            'box': (int(avg_x1), int(avg_y1), int(avg_x2), int(avg_y2)),
+                            'cx': cx,
+                            'cy': cy,
+                            'occupied': False,
+                            'id': None
+                        })
+
+                    if not stable_chairs:
+                        print("No stable chairs found!")
+                        is_calibrated = True
                         continue
-                    avg_x1 = sum(p['box'][0] for p in cluster['points']) / len(cluster['points'])
-                    avg_y1 = sum(p['box'][1] for p in cluster['points']) / len(cluster['points'])
-                    avg_x2 = sum(p['box'][2] for p in cluster['points']) / len(cluster['points'])
-                    avg_y2 = sum(p['box'][3] for p in cluster['points']) / len(cluster['points'])
-                    
-                    cx = (avg_x1 + avg_x2) / 2
-                    cy = (avg_y1 + avg_y2) / 2
-                    
-                    stable_chairs.append({
-                        'box': (int(avg_x1), int(avg_y1), int(avg_x2), int(avg_y2)),
-                        'cx': cx,
-                        'cy': cy,
-                        'occupied': False,
-                        'id': None
-                    })
-                
-                if not stable_chairs:
-                    print("No stable chairs found!")
+
+                    # 3. Grid Snapping
+                    # Find bounding box of all centroids
+                    min_x = min(c['cx'] for c in stable_chairs)
+                    max_x = max(c['cx'] for c in stable_chairs)
+                    min_y = min(c['cy'] for c in stable_chairs)
+                    max_y = max(c['cy'] for c in stable_chairs)
+
+                    # Avoid division by zero
+                    if max_x == min_x: max_x += 1
+                    if max_y == min_y: max_y += 1
+
+                    # Steps for 6 columns (5 intervals) and 5 rows (4 intervals)
+                    step_x = (max_x - min_x) / 5
+                    step_y = (max_y - min_y) / 4
+
+                    print(f"Grid Bounds: X[{min_x:.1f}, {max_x:.1f}], Y[{min_y:.1f}, {max_y:.1f}]")
+                    print(f"Step Sizes: X={step_x:.1f}, Y={step_y:.1f}")
+
+                    fixed_chair_boxes = []
+                    for chair in stable_chairs:
+                        # Calculate logical index
+                        col_idx = int(round((chair['cx'] - min_x) / step_x))
+                        row_idx = int(round((chair['cy'] - min_y) / step_y))
+
+                        # Clamp to grid limits
+                        col_idx = max(0, min(col_idx, 5))
+                        row_idx = max(0, min(row_idx, 4))
+
+                        # Assign ID
+                        chair['id'] = GRID_LAYOUT[row_idx][col_idx]
+                        chair['grid_pos'] = (row_idx, col_idx)
+                        fixed_chair_boxes.append(chair)
+                        print(f"Mapped Chair at ({chair['cx']:.0f}, {chair['cy']:.0f}) -> Grid({row_idx}, {col_idx}) -> {chair['id']}")
+
+                    print(f"Mapped {len(fixed_chair_boxes)} chairs to grid.")
+                    chair_box_arr = np.array([c['box'] for c in fixed_chair_boxes], dtype=np.int32)
+                    chair_min_overlap = 0.3 * (chair_box_arr[:, 2] - chair_box_arr[:, 0]) * (chair_box_arr[:, 3] - chair_box_arr[:, 1])
+                    chair_expanded_arr = np.array([expand_box(c['box'], SEAT_EXPAND_SCALE, *FRAME_SIZE)
+                                                   for c in fixed_chair_boxes], dtype=np.int32)
+                    chair_seat_idx = np.array([ALL_SEAT_IDS.index(c['id']) for c in fixed_chair_boxes], dtype=np.intp)
+                    calibrated_seat_idx = np.unique(chair_seat_idx)
                     is_calibrated = True
-                    continue
-
-                # 3. Grid Snapping
-                # Find bounding box of all centroids
-                min_x = min(c['cx'] for c in stable_chairs)
-                max_x = max(c['cx'] for c in stable_chairs)
-                min_y = min(c['cy'] for c in stable_chairs)
-                max_y = max(c['cy'] for c in stable_chairs)
-                
-                # Avoid division by zero
-                if max_x == min_x: max_x += 1
-                if max_y == min_y: max_y += 1
-                
-                # Steps for 6 columns (5 intervals) and 5 rows (4 intervals)
-                step_x = (max_x - min_x) / 5
-                step_y = (max_y - min_y) / 4
-                
-                print(f"Grid Bounds: X[{min_x:.1f}, {max_x:.1f}], Y[{min_y:.1f}, {max_y:.1f}]")
-                print(f"Step Sizes: X={step_x:.1f}, Y={step_y:.1f}")
-                
-                fixed_chair_boxes = []
-                for chair in stable_chairs:
-                    # Calculate logical index
-                    col_idx = int(round((chair['cx'] - min_x) / step_x))
-                    row_idx = int(round((chair['cy'] - min_y) / step_y))
-                    
-                    # Clamp to grid limits
-                    col_idx = max(0, min(col_idx, 5))
-                    row_idx = max(0, min(row_idx, 4))
-                    
-                    # Assign ID
-                    chair['id'] = GRID_LAYOUT[row_idx][col_idx]
-                    chair['grid_pos'] = (row_idx, col_idx)
-                    fixed_chair_boxes.append(chair)
-                    print(f"Mapped Chair at ({chair['cx']:.0f}, {chair['cy']:.0f}) -> Grid({row_idx}, {col_idx}) -> {chair['id']}")
-                
-                print(f"Mapped {len(fixed_chair_boxes)} chairs to grid.")
-                is_calibrated = True
-            
-            with lock:
-                seat_status = {"status": "calibrating", "progress": f"{frame_count}/{CALIBRATION_FRAMES}"}
-            cv2.waitKey(30)
-            continue
 
-        # Normal Operation
-        
-        # Pose Estimation
-        person_statuses = []
-        for (x1, y1, x2, y2) in persons:
-            person_crop = frame[y1:y2, x1:x2]
-            if person_crop.size == 0:
-                person_statuses.append("Standing")
+                if DEBUG:
+                    put_latest(render_queue, frame)
                 continue
-            person_rgb = cv2.cvtColor(person_crop, cv2.COLOR_BGR2RGB)
-            mp_results = pose.process(person_rgb)
-            status = "Standing"
-            if mp_results.pose_landmarks:
-                landmarks = mp_results.pose_landmarks.landmark
-                left_hip = landmarks[mp_pose.PoseLandmark.LEFT_HIP].y
-                right_hip = landmarks[mp_pose.PoseLandmark.RIGHT_HIP].y
-                left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER].y
-                right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER].y
-                hip_y = (left_hip + right_hip) / 2
-                shoulder_y = (left_shoulder + right_shoulder) / 2
-                ratio = (hip_y - shoulder_y)
-                if ratio >= 0.15:
-                    status = "Sitting"
-            person_statuses.append(status)
-
-        # Check Occupancy
-        for chair in fixed_chair_boxes:
-            chair['occupied'] = False
-            cx1, cy1, cx2, cy2 = chair['box']
-            
-            # Debug: Draw chair box and ID
-            cv2.rectangle(frame, (cx1, cy1), (cx2, cy2), (255, 0, 0), 2)
-            cv2.putText(frame, str(chair['id']), (cx1, cy1 - 5), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 0), 1)
-
-            for p_idx, person_box in enumerate(persons):
-                if person_statuses[p_idx] == "Sitting":
-                    px1, py1, px2, py2 = person_box
-                    # consider bottom half of person when determining overlap
-                    bottom_py = py1 + (py2 - py1) * 0.5
-                    bx1, by1, bx2, by2 = px1, int(bottom_py), px2, py2
-                    ix1 = max(cx1, bx1)
-                    iy1 = max(cy1, by1)
-                    ix2 = min(cx2, bx2)
-                    iy2 = min(cy2, by2)
-                    if ix2 > ix1 and iy2 > iy1:
-                        intersection_area = (ix2 - ix1) * (iy2 - iy1)
-                        chair_area = (cx2 - cx1) * (cy2 - cy1)
-                        if intersection_area > 0.3 * chair_area:
-                            chair['occupied'] = True
-                            # Debug: Draw occupied status
-                            cv2.rectangle(frame, (cx1, cy1), (cx2, cy2), (0, 255, 0), 2)
-                            break
-        
-        # Update Global State with smoothing
-        new_status = {}
-        for seat_id in ALL_SEAT_IDS:
-            # use previous counter to decide occupancy
-            occ = occupancy_counters.get(seat_id, 0)
-            new_status[seat_id] = "occupied" if occ >= OCCUPANCY_THRESHOLD_FRAMES else "vacant"
-        # update counters
-        for chair in fixed_chair_boxes:
-            if chair['id']:
-                if chair['occupied']:
-                    occupancy_counters[chair['id']] = occupancy_counters.get(chair['id'], 0) + 1
-                else:
-                    occupancy_counters[chair['id']] = 0
-
-        with lock:
-            seat_status = new_status
-            
-        cv2.imshow("Debug View", frame)
-        if cv2.waitKey(30) & 0xFF == ord('q'):
-            break
-            
-    cap.release()
-    cv2.destroyAllWindows()
 
-# Start background thread
-thread = threading.Thread(target=process_video, daemon=True)
-thread.start()
+            # Normal Operation
+
+            # Check Occupancy
+            person_arr = np.array(persons, dtype=np.int32).reshape(-1, 4)
+            # primary test: a person's hip point (box centre, 70% down) falls on the expanded chair box
+            hip_x = (person_arr[:, 0] + person_arr[:, 2]) // 2
+            hip_y = person_arr[:, 1] + ((person_arr[:, 3] - person_arr[:, 1]) * 7) // 10
+            hip_occupied = ((hip_x[None, :] >= chair_expanded_arr[:, 0, None])
+                            & (hip_x[None, :] <= chair_expanded_arr[:, 2, None])
+                            & (hip_y[None, :] >= chair_expanded_arr[:, 1, None])
+                            & (hip_y[None, :] <= chair_expanded_arr[:, 3, None])).any(axis=1)
+            # secondary confirm: the bottom half of a person covers more than 30% of the chair
+            lower_arr = person_arr.copy()
+            lower_arr[:, 1] += (lower_arr[:, 3] - lower_arr[:, 1]) // 2
+            overlap_occupied = (box_intersections(chair_box_arr, lower_arr) > chair_min_overlap[:, None]).any(axis=1)
+            occupied = hip_occupied | overlap_occupied
+
+            if DEBUG:
+                # Debug: Draw chair box and ID, green when occupied
+                for chair, is_occupied in zip(fixed_chair_boxes, occupied):
+                    cx1, cy1, cx2, cy2 = chair['box']
+                    color = (0, 255, 0) if is_occupied else (255, 0, 0)
+                    cv2.rectangle(frame, (cx1, cy1), (cx2, cy2), color, 2)
+                    cv2.putText(frame, str(chair['id']), (cx1, cy1 - 5),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 0), 1)
+
+            # Update Global State with smoothing
+            # use previous counters to decide occupancy
+            seat_state[:] = occupancy_counters >= OCCUPANCY_THRESHOLD_FRAMES
+            # update counters: consecutive occupied frames, reset to zero on a vacant frame. A seat
+            # is occupied when any of its chairs is, so reduce per seat before the single update
+            seat_occupied = np.bincount(chair_seat_idx, weights=occupied, minlength=len(ALL_SEAT_IDS)) > 0
+            occupancy_counters[calibrated_seat_idx] = np.where(seat_occupied[calibrated_seat_idx],
+                                                               occupancy_counters[calibrated_seat_idx] + 1, 0)
+
+            if DEBUG:
+                put_latest(render_queue, frame)
+
+def start_pipeline():
+    """Start the capture and inference threads, plus the render thread when DEBUG is set."""
+    global frame_queue
+    frame_queue = queue.Queue(maxsize=2 * BATCH_SIZE)
+    targets = [capture_frames, process_video]
+    if DEBUG:
+        targets.append(render_frames)
+    for target in targets:
+        threading.Thread(target=target, daemon=True).start()
 
 @app.get("/")
 async def get():
-    with open("index.html", "r") as f:
-        return HTMLResponse(f.read())
+    return HTMLResponse(index_html, headers={"Cache-Control": "public, max-age=3600"})
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    # seat order for decoding the occupancy bitmask: bit i is ALL_SEAT_IDS[i]
+    await websocket.send_json({"seat_ids": ALL_SEAT_IDS})
+    last_bits = None
     try:
         while True:
-            with lock:
-                current_status = seat_status.copy()
-            
-            total = len(ALL_SEAT_IDS)
-            occupied = sum(1 for v in current_status.values() if v == "occupied")
-            vacant = total - occupied
-            
-            data = {
-                "seats": current_status,
-                "stats": {
-                    "total": total,
-                    "occupied": occupied,
-                    "vacant": vacant
+            bits = int.from_bytes(np.packbits(seat_state, bitorder="little").tobytes(), "little")
+            # only push when some seat changed state
+            if bits != last_bits:
+                total = len(ALL_SEAT_IDS)
+                occupied = bin(bits).count("1")
+                data = {
+                    "bits": bits,
+                    "stats": {
+                        "total": total,
+                        "occupied": occupied,
+                        "vacant": total - occupied
+                    }
                 }
-            }
-            
-            await websocket.send_json(data)
+                await websocket.send_json(data)
+                last_bits = bits
             await asyncio.sleep(0.1)
     except WebSocketDisconnect:
         print("Client disconnected")
@@ -307,9 +470,16 @@ def parse_args():
     parser.add_argument("--model", default=MODEL_PATH, help="Path to YOLO model file")
     parser.add_argument("--conf", type=float, default=CONF_THRESHOLD, help="YOLO confidence threshold")
     parser.add_argument("--iou", type=float, default=IOU_THRESHOLD, help="YOLO IoU threshold")
+    parser.add_argument("--fps", type=float, default=TARGET_FPS, help="Frames per second to analyse; extra source frames are skipped")
     parser.add_argument("--calib-frames", type=int, default=CALIBRATION_FRAMES, help="Frames to use for calibration")
     parser.add_argument("--port", type=int, default=PORT, help="Port to serve on")
-    return parser.parse_args()
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help=f"Frames per YOLO call (max {MAX_ENGINE_BATCH} with TensorRT)")
+    parser.add_argument("--no-tensorrt", action="store_true", help="Run the PyTorch weights instead of a TensorRT engine")
+    parser.add_argument("--int8", action="store_true", help="Quantize the TensorRT engine to INT8 using frames from --video")
+    args = parser.parse_args()
+    if args.fps <= 0:
+        parser.error("--fps must be greater than 0")
+    return args
 
 if __name__ == "__main__":
     args = parse_args()
@@ -319,20 +489,17 @@ if __name__ == "__main__":
     CONF_THRESHOLD = args.conf
     IOU_THRESHOLD = args.iou
     CALIBRATION_FRAMES = args.calib_frames
+    TARGET_FPS = args.fps
     PORT = args.port
+    BATCH_SIZE = max(1, args.batch)
+    USE_TENSORRT = not args.no_tensorrt
+    USE_INT8 = args.int8
 
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
     logging.info("Starting application with video=%s model=%s", VIDEO_PATH, MODEL_PATH)
 
     # load model after parsing
-    model = YOLO(MODEL_PATH)
-
-    # initialize occupancy counters for all seats
-    for sid in ALL_SEAT_IDS:
-        occupancy_counters[sid] = 0
-
-    thread = threading.Thread(target=process_video, daemon=True)
-    thread.start()
+    model = load_model(MODEL_PATH)
 
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=PORT)
@@ -1,37 +1,91 @@
 import os
 import argparse
+import queue
+import threading
 import cv2
+import numpy as np
+import torch
 from ultralytics import YOLO
-import mediapipe as mp
-
-# Suppress TensorFlow logs
-os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 
 # Defaults (can be overridden via CLI)
 MODEL_PATH = "yolov8m.pt"
+# multi-person pose model: person boxes and COCO keypoints for everyone in one forward pass
+POSE_MODEL_PATH = "yolov8m-pose.pt"
 VIDEO_PATH = "vedio3.mp4"
 CONF_THRESHOLD = 0.4
 IOU_THRESHOLD = 0.5
+# COCO class id; the detector is only used for chairs, people come from the pose model
+CHAIR_CLASS = 56
+# COCO keypoint indices and the confidence a keypoint needs to count as visible
+LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP = 5, 6, 11, 12
+KEYPOINT_CONF = 0.5
+# frames read ahead and sent to YOLO in one call so the GPU sees full batches
+BATCH_SIZE = 4
+# On CUDA machines the .pt weights are exported once to a TensorRT engine (FP16 on GPUs with
+# Tensor Cores) built for INFER_IMGSZ, the letterboxed size a 960x540 frame is run at, with a
+# dynamic batch up to MAX_ENGINE_BATCH. Same settings as app.py, so the two share the engine.
+USE_TENSORRT = True
+INFER_IMGSZ = (384, 640)
+MAX_ENGINE_BATCH = 8
 
 # Parse command line arguments
 parser = argparse.ArgumentParser(description="Final test visualization")
 parser.add_argument("--video", default=VIDEO_PATH, help="Path to video file")
 parser.add_argument("--model", default=MODEL_PATH, help="Path to YOLO model")
+parser.add_argument("--pose-model", default=POSE_MODEL_PATH, help="Path to YOLO pose model")
 parser.add_argument("--conf", type=float, default=CONF_THRESHOLD, help="YOLO confidence")
 parser.add_argument("--iou", type=float, default=IOU_THRESHOLD, help="YOLO IoU")
+parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="Frames per YOLO call")
+parser.add_argument("--no-tensorrt", action="store_true", help="Run the .pt models without exporting TensorRT engines")
 args = parser.parse_args()
 
 MODEL_PATH = args.model
+POSE_MODEL_PATH = args.pose_model
 VIDEO_PATH = args.video
 CONF_THRESHOLD = args.conf
 IOU_THRESHOLD = args.iou
+BATCH_SIZE = max(1, args.batch)
+USE_TENSORRT = not args.no_tensorrt
+
+
+def load_model(model_path, task):
+    """Load a YOLO model, through a TensorRT engine exported next to the .pt weights when possible."""
+    if USE_TENSORRT and BATCH_SIZE > MAX_ENGINE_BATCH:
+        print(f"Batch size {BATCH_SIZE} exceeds the TensorRT engine limit of {MAX_ENGINE_BATCH}; using {model_path}")
+    elif USE_TENSORRT and model_path.endswith(".pt") and torch.cuda.is_available():
+        engine_path = os.path.splitext(model_path)[0] + ".engine"
+        if not os.path.exists(engine_path):
+            half = torch.cuda.get_device_capability(0) >= (7, 0)
+            print(f"Exporting {model_path} to TensorRT engine (half={half})")
+            YOLO(model_path).export(format="engine", half=half, imgsz=INFER_IMGSZ, dynamic=True,
+                                    batch=MAX_ENGINE_BATCH, device=0)
+        model_path = engine_path
+    return YOLO(model_path, task=task)
+
+
+model = load_model(MODEL_PATH, "detect")
+pose_model = load_model(POSE_MODEL_PATH, "pose")
+
+
+def classify_persons(results):
+    """Return person boxes and "Sitting"/"Standing" statuses from one pose result.
+
+    A person sits when the hips are at least 15% of the box height below the shoulders;
+    people whose shoulders or hips aren't all visible count as standing."""
+    boxes = results.boxes
+    keep = boxes.conf.cpu().numpy() >= CONF_THRESHOLD
+    persons = boxes.xyxy.cpu().numpy().astype(np.int32)[keep]
+    if results.keypoints is None or not len(persons):
+        return persons.tolist(), ["Standing"] * len(persons)
+    kpts = results.keypoints.data.cpu().numpy()[keep]  # (N, 17, 3): x, y, conf
+    torso = kpts[:, [LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP]]
+    visible = (torso[:, :, 2] >= KEYPOINT_CONF).all(axis=1)
+    shoulder_y = torso[:, :2, 1].mean(axis=1)
+    hip_y = torso[:, 2:, 1].mean(axis=1)
+    height = np.maximum(persons[:, 3] - persons[:, 1], 1)
+    sitting = visible & ((hip_y - shoulder_y) / height >= 0.15)
+    return persons.tolist(), ["Sitting" if s else "Standing" for s in sitting]
 
-# Load YOLOv8 model
-model = YOLO(MODEL_PATH)
-
-# Initialize Mediapipe Pose
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(static_image_mode=False, min_detection_confidence=0.5)
 
 # Video source
 video_path = VIDEO_PATH
@@ -41,65 +95,94 @@ cap = cv2.VideoCapture(video_path)
 GT_CHAIRS = 23
 GT_SITTING = 12
 
+# Decode, inference (YOLO + pose) and display run as three stages joined by bounded queues,
+# so reading the video and drawing overlap with the models. Puts block rather than drop, so
+# every frame is still shown; None marks the end of the video.
+decode_q = queue.Queue(maxsize=BATCH_SIZE * 2)
+infer_q = queue.Queue(maxsize=BATCH_SIZE * 2)
+stop_event = threading.Event()
+
+
+def put_until_stopped(q, item):
+    """Blocking put that gives up once stop_event is set; returns whether the item was queued."""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def get_until_stopped(q):
+    """Blocking get that returns None once stop_event is set."""
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            pass
+    return None
+
+
+def decode_frames():
+    """Decode stage: read and resize every frame of the video."""
+    while not stop_event.is_set():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if not put_until_stopped(decode_q, cv2.resize(frame, (960, 540))):
+            return
+    put_until_stopped(decode_q, None)
+
+
+def infer_frames():
+    """Inference stage: run the chair detector and the pose model on batches of BATCH_SIZE frames."""
+    try:
+        end = False
+        while not end:
+            frames = []
+            while len(frames) < BATCH_SIZE:
+                frame = get_until_stopped(decode_q)
+                if frame is None:
+                    end = True
+                    break
+                frames.append(frame)
+            if not frames:
+                break
+            chair_results = model(frames, verbose=False, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD,
+                                  classes=[CHAIR_CLASS], imgsz=INFER_IMGSZ)
+            pose_results = pose_model(frames, verbose=False, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD,
+                                      imgsz=INFER_IMGSZ)
+            for frame, chair_res, pose_res in zip(frames, chair_results, pose_results):
+                # Pull boxes and confidences off the device once instead of per box
+                keep = chair_res.boxes.conf.cpu().numpy() >= CONF_THRESHOLD
+                chairs = chair_res.boxes.xyxy.cpu().numpy().astype(np.int32)[keep].tolist()
+                persons, statuses = classify_persons(pose_res)
+                if not put_until_stopped(infer_q, (frame, chairs, persons, statuses)):
+                    return
+    finally:
+        # also on errors, so the display loop never waits on a dead stage
+        put_until_stopped(infer_q, None)
+
+
+stages = [threading.Thread(target=decode_frames, daemon=True),
+          threading.Thread(target=infer_frames, daemon=True)]
+for stage in stages:
+    stage.start()
+
 frame_count = 0
 paused = False  # For pause/play toggle
 
 while True:
+    # Take the next analysed frame only when not paused
     if not paused:
-        ret, frame = cap.read()
-        if not ret:
+        item = infer_q.get()
+        if item is None:
             break
+        frame, chairs, persons, statuses = item
         frame_count += 1
-
-    frame = cv2.resize(frame, (960, 540))
-
-    # Run YOLO only when not paused (avoid recomputation)
-    if not paused:
-        results = model(frame, verbose=False, conf=CONF_THRESHOLD, iou=IOU_THRESHOLD)[0]
-        chairs, persons = [], []
-
-        for box in results.boxes:
-            cls_id = int(box.cls[0])
-            label = model.names[cls_id]
-            conf = float(box.conf[0])
-            if conf < CONF_THRESHOLD:
-                continue
-            x1, y1, x2, y2 = map(int, box.xyxy[0])
-            if label == "chair":
-                chairs.append((x1, y1, x2, y2))
-            elif label == "person":
-                persons.append((x1, y1, x2, y2))
-
-        sitting_count, standing_count = 0, 0
-        statuses = []
-        for (x1, y1, x2, y2) in persons:
-            person_crop = frame[y1:y2, x1:x2]
-            if person_crop.size == 0:
-                statuses.append("Standing")
-                standing_count += 1
-                continue
-
-            person_rgb = cv2.cvtColor(person_crop, cv2.COLOR_BGR2RGB)
-            mp_results = pose.process(person_rgb)
-
-            if mp_results.pose_landmarks:
-                landmarks = mp_results.pose_landmarks.landmark
-                left_hip = landmarks[mp_pose.PoseLandmark.LEFT_HIP].y
-                right_hip = landmarks[mp_pose.PoseLandmark.RIGHT_HIP].y
-                left_shoulder = landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER].y
-                right_shoulder = landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER].y
-                hip_y = (left_hip + right_hip) / 2
-                shoulder_y = (left_shoulder + right_shoulder) / 2
-                ratio = (hip_y - shoulder_y)
-                status = "Standing" if ratio < 0.15 else "Sitting"
-            else:
-                status = "Standing"
-
-            statuses.append(status)
-            if status == "Sitting":
-                sitting_count += 1
-            else:
-                standing_count += 1
+        sitting_count = statuses.count("Sitting")
+        standing_count = len(statuses) - sitting_count
 
     # Draw detections
     for (cx1, cy1, cx2, cy2) in chairs:
@@ -134,7 +217,7 @@ while True:
                     cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
 
     # Show frame
-    cv2.imshow("YOLO + Mediapipe Visualization", frame)
+    cv2.imshow("YOLO Pose Visualization", frame)
 
     # Keyboard controls
     key = cv2.waitKey(20) & 0xFF
@@ -143,5 +226,8 @@ while True:
     elif key == ord(' '):  # spacebar to pause/play
         paused = not paused
 
+stop_event.set()
+for stage in stages:
+    stage.join()
 cap.release()
 cv2.destroyAllWindows()
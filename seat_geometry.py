@@ -0,0 +1,62 @@
+"""Box and clustering helpers for seat calibration and occupancy; NumPy/SciPy only."""
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+# merged chair clusters are split with a halved radius, but never below this many pixels
+MIN_CLUSTER_EPS = 5
+
+def box_intersections(boxes_a, boxes_b):
+    """Pairwise intersection areas between (N,4) and (M,4) xyxy box arrays, as an (N,M) array."""
+    iw = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2]) - np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    ih = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3]) - np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    return np.maximum(iw, 0) * np.maximum(ih, 0)
+
+def cluster_chair_detections(boxes, eps, min_samples, max_size=None):
+    """Group chair detections whose centres lie within `eps` pixels of each other, DBSCAN-style:
+    clusters only grow through detections with at least `min_samples` neighbours, and other
+    detections join the nearest such core detection or are dropped as noise.
+
+    In a dense hall jitter can chain neighbouring chairs into one cluster. A chair yields at
+    most one detection per frame, so a cluster holding more than `max_size` detections is
+    split again with half the radius.
+
+    Returns a list of (K,4) float arrays, one per cluster."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if not len(boxes):
+        return []
+    centres = (boxes[:, :2] + boxes[:, 2:]) / 2
+    is_core = cKDTree(centres).query_ball_point(centres, eps, return_length=True) >= min_samples
+    core_idx = np.flatnonzero(is_core)
+    if not len(core_idx):
+        return []
+    core_tree = cKDTree(centres[core_idx])
+    pairs = core_tree.query_pairs(eps, output_type="ndarray")
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(len(core_idx), len(core_idx)))
+    n_clusters, core_labels = connected_components(graph, directed=False)
+
+    labels = np.full(len(boxes), -1)
+    labels[core_idx] = core_labels
+    border_idx = np.flatnonzero(~is_core)
+    if len(border_idx):
+        dist, nearest = core_tree.query(centres[border_idx], distance_upper_bound=eps)
+        reachable = np.isfinite(dist)
+        labels[border_idx[reachable]] = core_labels[nearest[reachable]]
+
+    clusters = []
+    for k in range(n_clusters):
+        cluster = boxes[labels == k]
+        if max_size is not None and len(cluster) > max_size and eps >= 2 * MIN_CLUSTER_EPS:
+            clusters.extend(cluster_chair_detections(cluster, eps / 2, min_samples, max_size))
+        else:
+            clusters.append(cluster)
+    return clusters
+
+def expand_box(box, scale, width, height):
+    """Grow an xyxy box around its centre by `scale`, clamped to the frame."""
+    x1, y1, x2, y2 = box
+    cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+    half_w, half_h = (x2 - x1) * scale / 2, (y2 - y1) * scale / 2
+    return (max(0, int(cx - half_w)), max(0, int(cy - half_h)),
+            min(width - 1, int(cx + half_w)), min(height - 1, int(cy + half_h)))
@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+
+from seat_geometry import box_intersections, cluster_chair_detections, expand_box
+
+# app.py defaults
+CALIBRATION_FRAMES = 45
+CHAIR_CLUSTER_EPS = 50
+
+
+def synthetic_detections(spacing, jitter, frames=45, miss_rate=0.1, seed=0):
+    """Chair boxes for a 6x5 hall over `frames` frames, centres `spacing` px apart with
+    Gaussian jitter, each chair missed in about `miss_rate` of the frames."""
+    rng = np.random.default_rng(seed)
+    centres = [(100 + col * spacing, 100 + row * spacing) for row in range(5) for col in range(6)]
+    boxes = []
+    for _ in range(frames):
+        for cx, cy in centres:
+            if rng.random() < miss_rate:
+                continue
+            dx, dy = rng.normal(0, jitter, 2)
+            half_w, half_h = 20 + rng.normal(0, 1.5), 25 + rng.normal(0, 1.5)
+            boxes.append([cx + dx - half_w, cy + dy - half_h, cx + dx + half_w, cy + dy + half_h])
+    return boxes
+
+
+class ClusterChairDetectionsTest(unittest.TestCase):
+
+    def stable_clusters(self, boxes):
+        min_detections = CALIBRATION_FRAMES * 0.4
+        clusters = cluster_chair_detections(boxes, eps=CHAIR_CLUSTER_EPS,
+                                            min_samples=int(min_detections),
+                                            max_size=CALIBRATION_FRAMES)
+        return [c for c in clusters if len(c) >= min_detections]
+
+    def test_spread_out_chairs(self):
+        self.assertEqual(len(self.stable_clusters(synthetic_detections(spacing=100, jitter=6))), 30)
+
+    def test_closely_spaced_chairs_are_not_chained(self):
+        for spacing in (55, 45):
+            clusters = self.stable_clusters(synthetic_detections(spacing=spacing, jitter=6))
+            self.assertEqual(len(clusters), 30, f"spacing={spacing}")
+            self.assertTrue(all(len(c) <= CALIBRATION_FRAMES for c in clusters))
+
+
+class BoxHelpersTest(unittest.TestCase):
+
+    def test_box_intersections(self):
+        chairs = np.array([[0, 0, 10, 10], [20, 20, 30, 30]], dtype=np.int32)
+        persons = np.array([[5, 5, 15, 15], [100, 100, 110, 110]], dtype=np.int32)
+        np.testing.assert_array_equal(box_intersections(chairs, persons), [[25, 0], [0, 0]])
+
+    def test_expand_box_is_clamped_to_frame(self):
+        self.assertEqual(expand_box((100, 100, 200, 200), 1.5, 960, 540), (75, 75, 225, 225))
+        self.assertEqual(expand_box((0, 500, 100, 539), 2.0, 960, 540), (0, 480, 150, 539))
+
+
+if __name__ == "__main__":
+    unittest.main()